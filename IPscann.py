@@ -3,8 +3,9 @@ Network Scanner Script using ARP Table.
 
 This script scans the network and logs details
 about the devices on the network, including their IP address, MAC address,
-hostname, and vendor (manufacturer). The information is saved in an Excel file with
-columns for time, IP, MAC, hostname, and vendor.
+hostname, and vendor (manufacturer). The information is appended to a CSV file with
+columns for time, IP, MAC, hostname, and vendor, and exported to an Excel file when
+the scan stops.
 
 Creator: Brandon Magaña Avalos
 """
@@ -20,20 +21,75 @@ from openpyxl.utils.cell import get_column_letter
 import platform
 import uuid
 import os
+import csv
+import shelve
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
 
 # Set the working directory to the script's directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 
+# File where MAC vendors are kept between runs, so restarts don't query the API again
+VENDOR_CACHE_FILE = 'mac-vendors-cache'
+vendor_cache_lock = threading.Lock()
+
+# Lowercases the hex digits of a MAC address, the separators are deleted when translating
+MAC_TRANSLATION = bytes.maketrans(b'ABCDEF', b'abcdef')
+BROADCAST_MAC = b'ffffffffffff'
+
+# IEEE OUI registry, downloadable from https://standards-oui.ieee.org/oui/oui.csv
+OUI_FILE = 'oui.csv'
+
+# Shared HTTP session, so vendor lookups reuse an open connection instead of a new TLS handshake each
+session = requests.Session()
+
+# The vendor API allows about one request per second, so requests are serialized and spaced out
+VENDOR_API_INTERVAL = 1
+vendor_api_lock = threading.Lock()
+vendor_api_last_request = 0
+
+# Seconds between the start of two scans
+SCAN_INTERVAL = 60
+
+# Seconds to wait for the hostname and vendor lookups of a scan, unanswered ones are logged as 'Unknown'
+LOOKUP_TIMEOUT = 1
+
+# Maximum number of threads for the hostname lookups, and separately for the vendor lookups
+MAX_LOOKUP_THREADS = 64
+
+# Number of buffered rows that triggers a write to the log even if the network didn't change
+FLUSH_ROWS = 100
+
+# Columns of the network log
+LOG_HEADER = ["Time", "IP", "MAC", "Hostname", "Vendor"]
+
+# Widest value of each column per log file, kept up to date as rows are logged
+column_widths = {}
+
+# Matches the lines of the 'arp -a' output that start with an IP address
+ARP_LINE_PATTERN = re.compile(r'^\s*\d{1,3}(?:\.\d{1,3}){3}')
+
 def get_local_ip():
     """
     Get the local IP address of the current machine.
 
+    The address of the interface used for the default route is preferred, since resolving
+    the hostname often returns a loopback address on Linux (e.g. 127.0.1.1).
+
     Returns:
         str: The local IP address of the machine where the script is executed.
     """
-    hostname = socket.gethostname()
-    local_ip = socket.gethostbyname(hostname)
+    try:
+        # Connecting a UDP socket sends no packet, it only makes the OS choose the outgoing interface
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(('8.8.8.8', 80))
+            local_ip = s.getsockname()[0]
+    except OSError:
+        # No route available, fall back to resolving the hostname
+        hostname = socket.gethostname()
+        local_ip = socket.gethostbyname(hostname)
     return local_ip
 
 def get_local_mac():
@@ -47,6 +103,18 @@ def get_local_mac():
     mac_address = ':'.join(('%012X' % mac)[i:i+2] for i in range(0, 12, 2))
     return mac_address
 
+def normalize_mac(mac):
+    """
+    Normalize a MAC address to the key used for comparisons and vendor lookups.
+
+    Args:
+        mac (str): The MAC address, separated by colons or dashes.
+
+    Returns:
+        bytes: The 12 lowercase hex digits of the MAC address, e.g. b'fcfbfb01fa21'.
+    """
+    return mac.encode().translate(MAC_TRANSLATION, delete=b':-')
+
 def get_hostname(ip):
     """
     Resolve an IP address to its corresponding hostname.
@@ -58,143 +126,417 @@ def get_hostname(ip):
         str: The hostname of the device if resolvable, otherwise 'Unknown'.
     """
     try:
-        hostname = socket.gethostbyaddr(ip)[0]
-    except socket.herror:
+        # Only the name is returned, and NI_NAMEREQD raises gaierror when the address has no name
+        hostname = socket.getnameinfo((ip, 0), socket.NI_NAMEREQD | socket.NI_NUMERICSERV)[0]
+    except socket.gaierror:
         hostname = None
     return hostname
 
+def load_oui_database(oui_file):
+    """
+    Load the IEEE OUI registry into a dictionary for offline vendor lookups.
+
+    Args:
+        oui_file (str): The path to the IEEE 'oui.csv' file.
+
+    Returns:
+        dict: The vendor names keyed by the OUI as 6 lowercase hex digits (b'fcfbfb'),
+        empty if the file is missing.
+    """
+    try:
+        with open(oui_file, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Skip the header row
+            # Columns: Registry, Assignment (hex OUI), Organization Name, Organization Address
+            return {normalize_mac(row[1]): row[2] for row in reader if len(row) > 2}
+    except FileNotFoundError:
+        return {}
+
+OUI_DATABASE = load_oui_database(OUI_FILE)
+
+@lru_cache(maxsize=8192)
+def get_vendor_by_oui(oui):
+    """
+    Get the vendor name for a MAC address prefix (OUI), using the persistent cache
+    before falling back to the external API.
+
+    The OUI of a vendor never changes, so each prefix is only requested once.
+    Failed requests raise instead of returning, so they are not cached.
+    Requests to the API are spaced at least VENDOR_API_INTERVAL seconds apart.
+
+    Args:
+        oui (str): The first three octets of the MAC address, as 'XX:XX:XX'.
+
+    Returns:
+        str: The vendor name, or 'Unknown' if the API does not know the prefix.
+    """
+    global vendor_api_last_request
+
+    with vendor_cache_lock, shelve.open(VENDOR_CACHE_FILE) as cache:
+        if oui in cache:
+            return cache[oui]
+
+    url = f'https://api.macvendors.com/{oui}'
+    with vendor_api_lock:
+        delay = vendor_api_last_request + VENDOR_API_INTERVAL - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            response = session.get(url, timeout=2)
+        finally:
+            vendor_api_last_request = time.monotonic()
+    if response.status_code == 404:
+        vendor = 'Unknown'
+    else:
+        response.raise_for_status()
+        vendor = response.text
+
+    with vendor_cache_lock, shelve.open(VENDOR_CACHE_FILE) as cache:
+        cache[oui] = vendor
+    return vendor
+
 def get_mac_vendor(mac):
     """
-    Get the vendor/manufacturer name associated with a MAC address using an external API.
+    Get the vendor/manufacturer name associated with a MAC address using the local
+    OUI registry, or an external API when the registry does not know it.
 
     Args:
         mac (str): The MAC address of the device.
 
     Returns:
-        str: The vendor name, or 'Unknown' if the vendor is not available.
+        str: The vendor name, or 'Unknown' if the vendor is not known.
+
+    Raises:
+        requests.RequestException: If the request to the API failed (e.g. rate limiting),
+            so that the lookup can be retried later.
     """
-    try:
-        url = f'https://api.macvendors.com/{mac}'
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.text
-        else:
-            return 'Unknown'
-    except Exception as e:
-        return 'Unknown'
+    oui = normalize_mac(mac)[:6]
+    # Look the vendor up in the local OUI registry, only asking the API for unknown prefixes
+    vendor = OUI_DATABASE.get(oui)
+    if vendor:
+        return vendor
+    oui = oui.decode().upper()
+    return get_vendor_by_oui(f'{oui[0:2]}:{oui[2:4]}:{oui[4:6]}')
 
-def scan_network_with_arp():
+def read_arp_table_linux(ip_prefix):
     """
-    Scan the network using the ARP command to retrieve IP and MAC addresses of devices.
+    Read the kernel ARP table directly from /proc/net/arp, without running any command.
+
+    Args:
+        ip_prefix (str): Only entries whose IP address starts with this prefix are returned.
 
     Returns:
         list: A list of dictionaries, each containing 'ip' and 'mac' keys for network devices.
     """
-    command = 'arp -a'
-    result = subprocess.run(command, capture_output=True, text=True, shell=True)
     devices = []
-    local_ip_octet = get_local_ip().split('.')[0]  # Get the first octet of the local IP
-    for line in result.stdout.split('\n'):
-        if re.match(r'^\s*\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', line):  # Match any IP address
+    with open('/proc/net/arp') as f:
+        next(f)  # Skip the header row
+        for line in f:
+            if not line.startswith(ip_prefix):
+                continue
+            # Columns: IP address, HW type, Flags, HW address, Mask, Device
             parts = line.split()
-            ip = parts[0]
-            mac = parts[1]
-            devices.append({'ip': ip, 'mac': mac})
+            # Incomplete entries have an all-zero MAC address
+            if len(parts) > 3 and parts[3] != '00:00:00:00:00:00':
+                devices.append({'ip': parts[0], 'mac': parts[3]})
+    return devices
+
+def scan_network_with_arp(ip_prefix):
+    """
+    Scan the network using the ARP table to retrieve IP and MAC addresses of devices.
+
+    On Linux the table is read from /proc/net/arp, otherwise the ARP command is used.
+
+    Args:
+        ip_prefix (str): Only devices whose IP address starts with this prefix are returned,
+            e.g. '192.168.1.' for the local network.
+
+    Returns:
+        list: A list of dictionaries, each containing 'ip' and 'mac' keys for network devices.
+    """
+    if platform.system() == 'Linux':
+        return read_arp_table_linux(ip_prefix)
+
+    command = ['arp', '-a']
+    devices = []
+    # Parse the output line by line as it is produced, instead of buffering all of it first
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as process:
+        for line in process.stdout:
+            # The prefix check is much cheaper than the pattern and rejects the other networks first
+            if line.lstrip().startswith(ip_prefix) and ARP_LINE_PATTERN.match(line):  # Match any IP address
+                parts = line.split()
+                ip = parts[0]
+                mac = parts[1]
+                devices.append({'ip': ip, 'mac': mac})
     return devices
 
-def log_devices(devices, log_file):
+def update_column_widths(log_file, rows):
     """
-    Log the scanned network devices' information into an Excel file.
+    Update the tracked column widths of a log file with newly logged rows.
+
+    The first call for a log file also reads the rows it already contains, so the widths
+    are correct when the script is restarted on an existing log.
 
     Args:
-        devices (list): A list of dictionaries containing 'ip' and 'mac' of network devices.
-        log_file (str): The path to the Excel file where the information will be logged.
+        log_file (str): The path to the CSV file where the rows are logged.
+        rows (list): The new rows, each a list of values in the LOG_HEADER order.
+
+    Returns:
+        list: The width of the widest value of each column.
     """
-    header = ["Time", "IP", "MAC", "Hostname", "Vendor"]
+    if log_file not in column_widths:
+        column_widths[log_file] = [len(name) for name in LOG_HEADER]
+        if os.path.exists(log_file):
+            with open(log_file, newline='', encoding='utf-8') as f:
+                update_column_widths(log_file, csv.reader(f))
+
+    widths = column_widths[log_file]
+    for row in rows:
+        for col_idx, value in enumerate(row):
+            widths[col_idx] = max(widths[col_idx], len(str(value)))
+    return widths
+
+def lookup_devices(ips, macs):
+    """
+    Resolve the hostnames of IP addresses and the vendors of MAC addresses concurrently.
+
+    Args:
+        ips (list): The IP addresses to resolve.
+        macs (list): The MAC addresses whose vendor to look up.
+
+    Returns:
+        tuple: The hostnames, in the order of ips, and the vendors, in the order of macs.
+        A value is 'Unknown' when the lookup found no name, and None when the lookup failed
+        or did not finish within LOOKUP_TIMEOUT, so that it can be retried later.
+    """
+    # Look up each IP address and each vendor prefix (OUI) only once per scan
+    unique_ips = list(dict.fromkeys(ips))
+    unique_ouis = {}
+    for mac in macs:
+        unique_ouis.setdefault(normalize_mac(mac)[:6], mac)
+
+    # The lookups spend almost all their time waiting on the network, so run them
+    # concurrently. Hostnames and vendors get their own pool, so that slow reverse
+    # lookups never hold up the vendor lookups queued behind them
+    hostname_executor = ThreadPoolExecutor(max_workers=max(1, min(MAX_LOOKUP_THREADS, len(unique_ips))))
+    vendor_executor = ThreadPoolExecutor(max_workers=max(1, min(MAX_LOOKUP_THREADS, len(unique_ouis))))
     try:
-        # Load the existing workbook
-        workbook = openpyxl.load_workbook(log_file)
-        sheet = workbook.active
-    except FileNotFoundError:
-        # Create a new workbook if the file doesn't exist
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        # Set the header row
-        sheet.append(header)
-    
+        hostname_futures = {ip: hostname_executor.submit(get_hostname, ip) for ip in unique_ips}
+        vendor_futures = {oui: vendor_executor.submit(get_mac_vendor, mac) for oui, mac in unique_ouis.items()}
+
+        # Hosts without a reverse DNS entry can block for the full system resolver timeout,
+        # so only wait up to LOOKUP_TIMEOUT for the whole batch
+        done, _ = wait([*hostname_futures.values(), *vendor_futures.values()], timeout=LOOKUP_TIMEOUT)
+
+        hostnames = []
+        for ip in ips:
+            future = hostname_futures[ip]
+            if future in done and future.exception() is None:
+                hostnames.append(future.result() or 'Unknown')
+            else:
+                hostnames.append(None)
+
+        vendors = []
+        for mac in macs:
+            future = vendor_futures[normalize_mac(mac)[:6]]
+            if future in done and future.exception() is None:
+                vendors.append(future.result())
+            else:
+                vendors.append(None)
+    finally:
+        # Don't wait for the lookups that timed out, their threads finish in the background
+        hostname_executor.shutdown(wait=False, cancel_futures=True)
+        vendor_executor.shutdown(wait=False, cancel_futures=True)
+    return hostnames, vendors
+
+def resolve_devices(devices, local_ip):
+    """
+    Build the log rows of the scanned network devices, resolving their hostname and vendor.
+
+    Args:
+        devices (list): A list of dictionaries containing 'ip' and 'mac' of network devices,
+            as returned by scan_network_with_arp().
+        local_ip (str): The local IP address of the machine, as returned by get_local_ip().
+
+    Returns:
+        list: The rows to log, the local machine first, each a list of values in the LOG_HEADER order.
+        The hostname or vendor is None when its lookup failed or timed out.
+    """
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    # Log the local machine first
-    current_device_ip = get_local_ip()
-    current_device_mac = get_local_mac()
-    current_device_hostname = get_hostname(current_device_ip) or 'Unknown'
-    current_device_vendor = get_mac_vendor(current_device_mac) or 'Unknown'
-    current_device_row = [timestamp, current_device_ip, current_device_mac, current_device_hostname, current_device_vendor]
-    
-    # Append the local machine info
-    sheet.append(current_device_row)
+    # Skip devices with MAC address ff-ff-ff-ff-ff-ff
+    devices = [device for device in devices if normalize_mac(device['mac']) != BROADCAST_MAC]
 
-    # Get the first three octets of the local IP address
-    local_ip_prefix = '.'.join(get_local_ip().split('.')[:3])
-    
-    for device in devices:
-        # Skip devices with MAC address ff-ff-ff-ff-ff-ff
-        if device['mac'].lower() == 'ff-ff-ff-ff-ff-ff':
-            continue
-        # Skip devices with IP address that does not start with the local IP prefix
-        if not device['ip'].startswith(local_ip_prefix):
-            continue
-
-        hostname = get_hostname(device['ip']) or 'Unknown'
-        vendor = get_mac_vendor(device['mac']) or 'Unknown'
-        row = [timestamp, device['ip'], device['mac'], hostname, vendor]
-        sheet.append(row)
-
-    # Adjust column widths
-    for col_idx, col in enumerate(sheet.columns, start=1):
-        max_length = max(len(str(cell.value)) for cell in col)
-        sheet.column_dimensions[get_column_letter(col_idx)].width = max_length + 2
-    
-    # Add filter to the columns
-    sheet.auto_filter.ref = f'A1:E{sheet.max_row}'
-    
-    # Save the workbook, retrying if a PermissionError occurs
+    # The local machine is logged first, resolved in the same batch as the other devices
+    ips = [local_ip] + [device['ip'] for device in devices]
+    macs = [get_local_mac()] + [device['mac'] for device in devices]
+
+    hostnames, vendors = lookup_devices(ips, macs)
+    return [
+        [timestamp, ip, mac, hostname, vendor]
+        for ip, mac, hostname, vendor in zip(ips, macs, hostnames, vendors)
+    ]
+
+def refresh_rows(rows):
+    """
+    Reuse the rows of the previous scan for an unchanged network, with the current time.
+
+    Only the hostnames and vendors whose lookup failed or timed out (None) are looked up
+    again. A device without a name keeps 'Unknown' until the ARP table changes.
+
+    Args:
+        rows (list): The rows of the previous scan, as returned by resolve_devices().
+
+    Returns:
+        list: The rows to log for the current scan.
+    """
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = [[timestamp] + row[1:] for row in rows]
+
+    missing_hostnames = [row for row in rows if row[3] is None]
+    missing_vendors = [row for row in rows if row[4] is None]
+    if missing_hostnames or missing_vendors:
+        hostnames, vendors = lookup_devices(
+            [row[1] for row in missing_hostnames], [row[2] for row in missing_vendors]
+        )
+        for row, hostname in zip(missing_hostnames, hostnames):
+            row[3] = hostname
+        for row, vendor in zip(missing_vendors, vendors):
+            row[4] = vendor
+    return rows
+
+def log_devices(rows, log_file):
+    """
+    Log the scanned network devices' information by appending it to a CSV file.
+
+    Only the new rows are written, so the cost of a scan does not grow with the size of the log.
+
+    Args:
+        rows (list): The rows to log, as returned by resolve_devices().
+        log_file (str): The path to the CSV file where the information will be logged.
+    """
+    # Hostnames and vendors that could not be resolved are logged as 'Unknown'
+    rows = [[value if value is not None else 'Unknown' for value in row] for row in rows]
+    update_column_widths(log_file, rows)
+
+    # Append the rows, retrying if a PermissionError occurs
     while True:
         try:
-            workbook.save(log_file)
+            write_header = not os.path.exists(log_file)
+            with open(log_file, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if write_header:
+                    writer.writerow(LOG_HEADER)
+                writer.writerows(rows)
             print(f"Information logged to {log_file}")
             break
         except PermissionError:
             print(f"Permission denied: {log_file} is open. Retrying in 5 seconds...")
             time.sleep(5)
 
+def export_xlsx(log_file, xlsx_file):
+    """
+    Export the CSV network log to an Excel file, with adjusted column widths and filters.
+
+    The workbook is written in openpyxl's write-only mode, streaming the rows from the CSV file.
+
+    Args:
+        log_file (str): The path to the CSV file with the logged information.
+        xlsx_file (str): The path to the Excel file to create.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+
+    # Adjust column widths, using the widths tracked while the rows were logged
+    for col_idx, width in enumerate(update_column_widths(log_file, []), start=1):
+        sheet.column_dimensions[get_column_letter(col_idx)].width = width + 2
+
+    row_count = 0
+    with open(log_file, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            sheet.append(row)
+            row_count += 1
+
+    # Add filter to the columns
+    sheet.auto_filter.ref = f'A1:E{row_count}'
+
+    # Save the workbook, retrying if a PermissionError occurs
+    while True:
+        try:
+            workbook.save(xlsx_file)
+            print(f"Information exported to {xlsx_file}")
+            break
+        except PermissionError:
+            print(f"Permission denied: {xlsx_file} is open. Retrying in 5 seconds...")
+            time.sleep(5)
+
 def WindowsScann():
     """
-    Perform a network scan and log the results on a Windows machine.
+    Perform a network scan and log the results on a Windows or Linux machine.
+
+    The network is scanned using ARP, and the details of devices on the network are appended
+    to a CSV file. A scan starts every 60 seconds (SCAN_INTERVAL) until it is stopped with
+    Ctrl+C, then the log is exported to an Excel file.
 
-    The network is scanned using ARP, and the details of devices on the network are saved
-    to an Excel file. The scan repeats every 60 seconds.
+    Rows are buffered and only written when the ARP table changes or FLUSH_ROWS rows are pending.
+    While the ARP table stays the same, the hostnames and vendors of the previous scan are reused
+    and only the unresolved ones are looked up again.
     """
-    log_file = f"network-log-{datetime.now().strftime('%Y-%m-%d')}.xlsx"
+    log_file = f"network-log-{datetime.now().strftime('%Y-%m-%d')}.csv"
+    # A distinct name, so Excel logs written by earlier versions of the script are never overwritten
+    xlsx_file = log_file.replace('.csv', '-export.xlsx')
+    pending_rows = []
+    scan_rows = []
+    last_scan = None
     
-    while True:
-        print(f"Scanning network on {socket.gethostname()} | IP address: {get_local_ip()}")
-        devices = scan_network_with_arp()
-        
-        # Log devices, including the local machine
-        log_devices(devices, log_file)
-        
-        print("Waiting 60 seconds before the next scan...")
-        time.sleep(60)  # Wait for 60 seconds before the next scan
+    try:
+        while True:
+            scan_started = time.monotonic()
+
+            # Resolve the local IP once per scan and share it with the logging step
+            local_ip = get_local_ip()
+            print(f"Scanning network on {socket.gethostname()} | IP address: {local_ip}")
+
+            # Only keep the devices whose IP address starts with the first three octets of the local IP
+            local_ip_prefix = '.'.join(local_ip.split('.')[:3]) + '.'
+            devices = scan_network_with_arp(local_ip_prefix)
+            
+            # Compare with the previous scan, so an unchanged network can be detected without any lookup
+            scan = (local_ip, sorted((device['ip'], device['mac']) for device in devices))
+
+            if scan == last_scan:
+                # Same devices as the previous scan
+                scan_rows = refresh_rows(scan_rows)
+            else:
+                scan_rows = resolve_devices(devices, local_ip)
+
+            # Buffer the devices, including the local machine
+            pending_rows.extend(scan_rows)
+
+            # Write the buffered rows as soon as the network changes, otherwise in batches
+            if scan != last_scan or len(pending_rows) >= FLUSH_ROWS:
+                log_devices(pending_rows, log_file)
+                pending_rows = []
+            last_scan = scan
+            
+            # Only wait for the rest of the interval, so the time spent scanning doesn't delay the next scan
+            remaining = max(0, SCAN_INTERVAL - (time.monotonic() - scan_started))
+            print(f"Waiting {remaining:.0f} seconds before the next scan...")
+            time.sleep(remaining)
+    except KeyboardInterrupt:
+        print("Scan stopped.")
+    finally:
+        if pending_rows:
+            log_devices(pending_rows, log_file)
+        if os.path.exists(log_file):
+            export_xlsx(log_file, xlsx_file)
 
 if __name__ == '__main__':
     """
-    Main function to determine the OS and execute the network scan for Windows.
+    Main function to determine the OS and execute the network scan for Windows or Linux.
     """
     print("Running the Scan Script on: " + platform.system())
-    if platform.system() == 'Linux':
-        print('Linux scanning is not implemented.')
-    elif platform.system() == 'Windows':
+    if platform.system() in ('Linux', 'Windows'):
         WindowsScann()
     else:
         print('This script supports only Linux and Windows (10/11).')